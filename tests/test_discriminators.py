@@ -0,0 +1,159 @@
+"""Tests of discriminators."""
+
+import pytest
+import torch
+
+from vocos.discriminators import DiscriminatorP, MultiPeriodDiscriminator, MultiResolutionDiscriminator, squeeze_conv2d_optimizer_state
+
+
+def _twin_mpds(num_embeddings: None | int) -> tuple[MultiPeriodDiscriminator, MultiPeriodDiscriminator]:
+    """Per-period MPD and grouped MPD with identical FP64 parameters."""
+    torch.manual_seed(0)
+    serial = MultiPeriodDiscriminator(num_embeddings=num_embeddings)
+    if num_embeddings is not None:
+        # Embeddings are zero-initialized, which hides conditioning bugs
+        for d in serial.discriminators:
+            torch.nn.init.normal_(d.emb.weight)
+    grouped = MultiPeriodDiscriminator(num_embeddings=num_embeddings, group_periods=True)
+    grouped.load_state_dict(serial.state_dict())
+    return serial.double(), grouped.double()
+
+
+@pytest.mark.parametrize("num_embeddings", [None, 4])
+@pytest.mark.parametrize("t", [1000, 2310, 4621, 16384])
+def test_grouped_periods_equivalence(num_embeddings: None | int, t: int):
+    """Grouped run should reproduce the per-period run, in logits/fmaps and in gradients of input/parameters."""
+    serial, grouped = _twin_mpds(num_embeddings)
+    y     = torch.randn(2, t, dtype=torch.float64)
+    y_hat = torch.randn(2, t, dtype=torch.float64, requires_grad=True)
+    bandwidth_id = torch.tensor([1]) if num_embeddings is not None else None
+
+    grads = []
+    for mpd in (serial, grouped):
+        y_d_rs, y_d_gs, fmap_rs, fmap_gs = mpd(y, y_hat, bandwidth_id)
+        outputs = [*y_d_rs, *y_d_gs, *[f for fmap in fmap_rs + fmap_gs for f in fmap]]
+        loss = sum(o.pow(2).sum() for o in outputs)
+        grads.append((outputs, torch.autograd.grad(loss, [y_hat, *mpd.parameters()])))
+
+    (outputs_s, grads_s), (outputs_g, grads_g) = grads
+    for o_s, o_g in zip(outputs_s, outputs_g, strict=True):
+        assert o_s.shape == o_g.shape
+        torch.testing.assert_close(o_g, o_s)
+    for g_s, g_g in zip(grads_s, grads_g, strict=True):
+        torch.testing.assert_close(g_g, g_s)
+
+
+def test_grouped_periods_fallback_per_sample_condition():
+    """Per-sample conditioning is not groupable, so grouped MPD should fall back to (and match) the per-period run."""
+    serial, grouped = _twin_mpds(4)
+    y, y_hat = torch.randn(2, 4000, dtype=torch.float64), torch.randn(2, 4000, dtype=torch.float64)
+    bandwidth_id = torch.tensor([0, 3])
+
+    assert not grouped._groupable(bandwidth_id.repeat(2))
+    for o_s, o_g in zip(serial(y, y_hat, bandwidth_id)[0], grouped(y, y_hat, bandwidth_id)[0], strict=True):
+        torch.testing.assert_close(o_g, o_s)
+
+
+def test_grouped_periods_layout_cache_bounded():
+    """Layout cache of grouped MPD should keep only the last input signature, and be dropped on `.to()`."""
+    mpd = MultiPeriodDiscriminator(group_periods=True)
+    for t in (1000, 2000, 3000):
+        mpd(torch.randn(1, t), torch.randn(1, t))
+        assert list(mpd._grouped_layouts) == [(t, torch.device("cpu"), torch.float32)]
+    mpd.double()
+    assert not mpd._grouped_layouts
+
+
+def _run_and_grad(mpd: MultiPeriodDiscriminator, y: torch.Tensor, y_hat: torch.Tensor) -> tuple[list[torch.Tensor], list[torch.Tensor]]:
+    """Outputs (cloned from possibly-static buffers) and gradients of input/trainable parameters, or no gradients under no_grad."""
+    y_d_rs, y_d_gs, fmap_rs, fmap_gs = mpd(y, y_hat)
+    outputs = [*y_d_rs, *y_d_gs, *[f for fmap in fmap_rs + fmap_gs for f in fmap]]
+    if not torch.is_grad_enabled():
+        return [o.clone() for o in outputs], []
+    loss = sum(o.pow(2).sum() for o in outputs)
+    grads = torch.autograd.grad(loss, [y_hat, *[p for p in mpd.parameters() if p.requires_grad]])
+    return [o.detach().clone() for o in outputs], list(grads)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="CUDA graphs need a GPU.")
+@pytest.mark.parametrize("group_periods", [False, True])
+@pytest.mark.parametrize("grad_enabled", [True, False])
+def test_cuda_graphs_equivalence(group_periods: bool, grad_enabled: bool):
+    """Graphed run should reproduce the eager run in outputs and input/parameter gradients, also on replay and after unfreezing."""
+    torch.manual_seed(0)
+    eager = MultiPeriodDiscriminator(group_periods=group_periods).cuda()
+    graphed = MultiPeriodDiscriminator(group_periods=group_periods, use_cuda_graphs=True).cuda()
+    graphed.load_state_dict(eager.state_dict())
+
+    def check(requires_grad: bool):
+        for mpd in (eager, graphed):
+            mpd.requires_grad_(requires_grad)
+        y     = torch.randn(2, 4000, device="cuda")
+        y_hat = torch.randn(2, 4000, device="cuda", requires_grad=True)
+        with torch.set_grad_enabled(grad_enabled):
+            outputs_e, grads_e = _run_and_grad(eager,   y, y_hat)
+            outputs_g, grads_g = _run_and_grad(graphed, y, y_hat)
+        for o_e, o_g in zip(outputs_e, outputs_g, strict=True):
+            torch.testing.assert_close(o_g, o_e, rtol=1e-4, atol=1e-4)
+        assert len(grads_e) == len(grads_g)
+        for g_e, g_g in zip(grads_e, grads_g, strict=True):
+            torch.testing.assert_close(g_g, g_e, rtol=1e-4, atol=1e-4)
+
+    # Capture with frozen D (c.f. `toggle_optimizer`), replay, then trainable D with the same input signature
+    check(requires_grad=False)
+    check(requires_grad=False)
+    check(requires_grad=True)
+    check(requires_grad=True)
+
+
+def _to_conv2d_state_dict(state_dict: dict) -> dict:
+    """Conv2d-era state dict of DiscriminatorP/MPD, conv weights :: (Cout, Cin, K) -> (Cout, Cin, K, 1)."""
+    return {k: v.unsqueeze(-1) if ("convs." in k or "conv_post." in k) and v.dim() == 3 else v for k, v in state_dict.items()}
+
+
+def test_conv2d_checkpoint_load():
+    """Conv2d-era DiscriminatorP weights (weight_v/weight_g :: (Cout, Cin, K, 1)) should load and reproduce the outputs."""
+    torch.manual_seed(0)
+    reference = DiscriminatorP(period=3, num_embeddings=4)
+    torch.nn.init.normal_(reference.emb.weight)
+    old_state = _to_conv2d_state_dict(reference.state_dict())
+    assert old_state["convs.0.weight_v"].shape == (32, 1, 5, 1) and old_state["convs.0.weight_g"].shape == (32, 1, 1, 1)
+
+    restored = DiscriminatorP(period=3, num_embeddings=4)
+    restored.load_state_dict(old_state)
+
+    x, cond = torch.randn(2, 4001), torch.tensor([2])
+    (y_ref, fmap_ref), (y, fmap) = reference(x, cond), restored(x, cond)
+    torch.testing.assert_close(y, y_ref)
+    for f, f_ref in zip(fmap, fmap_ref, strict=True):
+        torch.testing.assert_close(f, f_ref)
+
+
+def test_conv2d_optimizer_state_migration():
+    """Conv2d-era AdamW state of D (c.f. `VocosExp.on_load_checkpoint`) should be migrated, then resumed with `step()`."""
+    torch.manual_seed(0)
+    mpd, mrd = MultiPeriodDiscriminator(), MultiResolutionDiscriminator()
+    x = torch.randn(1, 8000)
+
+    def loss_of(mpd_, mrd_):
+        return sum(o.sum() for o in mpd_(x, x)[0]) + sum(o.sum() for o in mrd_(x, x)[0])
+
+    # Old optimizer state, from the Conv2d-shaped parameters
+    old_params = [*[p.detach().unsqueeze(-1) if p.dim() == 3 else p.detach() for p in mpd.parameters()], *[p.detach() for p in mrd.parameters()]]
+    old_params = [p.clone().requires_grad_() for p in old_params]
+    old_opt = torch.optim.AdamW([{"params": old_params[:len(list(mpd.parameters()))]}, {"params": old_params[len(list(mpd.parameters())):]}])
+    for p_old, g in zip(old_params, torch.autograd.grad(loss_of(mpd, mrd), [*mpd.parameters(), *mrd.parameters()]), strict=True):
+        p_old.grad = g.reshape(p_old.shape)
+    old_opt.step()
+    optimizer_state = old_opt.state_dict()
+    assert optimizer_state["state"][1]["exp_avg"].dim() == 4
+
+    # Migration and resume
+    params = [*mpd.parameters(), *mrd.parameters()]
+    squeeze_conv2d_optimizer_state(optimizer_state, params)
+    opt = torch.optim.AdamW([{"params": mpd.parameters()}, {"params": mrd.parameters()}])
+    opt.load_state_dict(optimizer_state)
+    loss_of(mpd, mrd).backward()
+    opt.step()
+    for p in params:
+        assert opt.state[p]["exp_avg"].shape == p.shape
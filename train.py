@@ -4,6 +4,7 @@ from pytorch_lightning.cli import LightningCLI
 
 if __name__ == "__main__":
     torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.benchmark = True
 
     # Hack for Resume
     ckpt_path = None
@@ -1,10 +1,235 @@
-from typing import Tuple, List
+from typing import Callable, Tuple, List, Optional, TypeVar
+from functools import partial
+import math
 
 import torch
 from torch import nn, Tensor
-from torch.nn import Conv2d
+from torch.nn import Conv1d
 import torch.nn.functional as F
-from torch.nn.utils import weight_norm
+from torch.nn.utils import weight_norm, remove_weight_norm
+
+
+T = TypeVar("T")
+
+
+def _run_concurrently(fns: list[Callable[[], T]], streams: list[torch.cuda.Stream], device: torch.device) -> list[T]:
+    """Run independent jobs, concurrently on side CUDA streams (one per job) if on GPU.
+
+    Args:
+        fns     - Jobs, each returns a Tensor or a (nested) list/tuple of Tensors
+        streams - Side streams for each job, lazily populated on the first GPU call
+        device  - Device on which the jobs run
+    Returns:
+                - Output of each job
+    """
+    # CPU fallback - serial execution
+    if device.type != "cuda":
+        return [fn() for fn in fns]
+
+    if not streams:
+        streams.extend(torch.cuda.Stream(device=device) for _ in fns)
+
+    main = torch.cuda.current_stream(device)
+    outputs = []
+    for fn, stream in zip(fns, streams):
+        # Side stream should wait for the inputs computed on the main stream
+        stream.wait_stream(main)
+        with torch.cuda.stream(stream):
+            outputs.append(fn())
+    for stream in streams:
+        main.wait_stream(stream)
+
+    # Outputs allocated on side streams are consumed on the main stream
+    _record_stream(outputs, main)
+
+    return outputs
+
+
+def _record_stream(obj: Tensor | list | tuple, stream: torch.cuda.Stream) -> None:
+    """Mark all Tensors in a (nested) list/tuple as used by the stream."""
+    if isinstance(obj, Tensor):
+        obj.record_stream(stream)
+    else:
+        for item in obj:
+            _record_stream(item, stream)
+
+
+def _split_real_fake(
+    outputs: list[tuple[Tensor, list[Tensor]]]
+) -> tuple[list[Tensor], list[Tensor], list[list[Tensor]], list[list[Tensor]]]:
+    """Split sub-discriminators' outputs of real/fake-batched input :: (2B, ...) -> (B, ...) & (B, ...)"""
+    y_ds  = [y_d.chunk(2, dim=0) for y_d, _ in outputs]
+    fmaps = [[f.chunk(2, dim=0) for f in fmap] for _, fmap in outputs]
+    y_d_rs  = [y_d_r for y_d_r, _ in y_ds]
+    y_d_gs  = [y_d_g for _, y_d_g in y_ds]
+    fmap_rs = [[f_r for f_r, _ in fmap] for fmap in fmaps]
+    fmap_gs = [[f_g for _, f_g in fmap] for fmap in fmaps]
+    return y_d_rs, y_d_gs, fmap_rs, fmap_gs
+
+
+def _unzip_outputs(outputs: list[tuple[Tensor, list[Tensor]]]) -> tuple[list[Tensor], list[list[Tensor]]]:
+    """Unzip sub-discriminators' outputs into the list of y_d and the list of fmap."""
+    return [y_d for y_d, _ in outputs], [fmap for _, fmap in outputs]
+
+
+def _pad_to_period(x: Tensor, period: int) -> Tensor:
+    """Tail-pad waveforms with reflection so that its length becomes a multiple of the period (at most `period - 1` samples).
+
+    Args:
+        x      :: (B, T)
+        period - Period
+    Returns:
+               :: (B, T=period*Frame)
+    """
+    n_pad = -x.size(-1) % period
+    if n_pad == 0:
+        return x
+    return F.pad(x.unsqueeze(1), (0, n_pad), "reflect").squeeze(1)
+
+
+def _effective_weight(conv: nn.Module) -> Tensor:
+    """Weight of a conv, computed from the weight_norm parameters if the conv is weight-normalized."""
+    if hasattr(conv, "weight_g"):
+        v = conv.weight_v
+        return v * (conv.weight_g / v.norm(dim=tuple(range(1, v.dim())), keepdim=True))
+    return conv.weight
+
+
+def _grouped_periods_layout(
+    discriminators: nn.ModuleList, t: int, device: torch.device, dtype: torch.dtype,
+) -> tuple[int, list[list[int]], list[list[int]], list[Tensor]]:
+    """Layout of `_run_grouped_periods`, slot/valid length of each period & each layer, and gap masks.
+
+    Args:
+        discriminators - DiscriminatorPs
+        t              - Waveform length, tail-padded up to a multiple of each period
+    Returns:
+        length0        - Length of the stacked stream at the input
+        slots          - Slot length of each period, [layer_input][period]
+        valids         - Valid (unpadded) length in each slot, [layer_input][period]
+        masks          - (1, Group, 1, Length) mask which zeros the gaps of each layer's output
+    """
+    periods = [d.period for d in discriminators]
+    layers = [*discriminators[0].convs, discriminators[0].conv_post]
+    strides = [conv.stride[0] for conv in layers]
+    gap = max(conv.padding[0] for conv in layers)
+    stride_total = math.prod(strides)
+
+    # Slots are aligned to the total stride and keep >=`gap` zeros after the valid region even at the deepest layer
+    frames = [math.ceil(t / p) for p in periods]
+    slots  = [[stride_total * (math.ceil(frame / stride_total) + gap) for frame in frames]]
+    valids = [frames]
+    lengths = [max(p * slot for p, slot in zip(periods, slots[0]))]
+    for conv, stride in zip(layers, strides):
+        kernel, padding = conv.kernel_size[0], conv.padding[0]
+        # Invariants - a strided conv maps each slot onto exactly `slot // stride` outputs, and each row's zero padding comes from its own gap
+        assert all(slot % stride == 0 for slot in slots[-1]), "Slots should be aligned to the stride."
+        assert (lengths[-1] + 2 * padding - kernel) // stride + 1 == lengths[-1] // stride, "Conv should shrink the stream exactly by the stride."
+        assert all(slot - valid >= padding for slot, valid in zip(slots[-1], valids[-1])), "Gaps should be as long as the zero padding."
+        slots.append([slot // stride for slot in slots[-1]])
+        valids.append([(valid + 2 * padding - kernel) // stride + 1 for valid in valids[-1]])
+        lengths.append(lengths[-1] // stride)
+
+    masks = []
+    for length, slot, valid in zip(lengths[1:], slots[1:], valids[1:]):
+        pos = torch.arange(length, device=device)
+        masks.append(torch.stack([(pos < p * s) & (pos % s < v) for p, s, v in zip(periods, slot, valid)]).to(dtype)[None, :, None])
+
+    return lengths[0], slots, valids, masks
+
+
+def _run_grouped_periods(
+    discriminators: nn.ModuleList, x: Tensor, cond_embedding_id: None | Tensor, layouts: dict,
+) -> list[tuple[Tensor, list[Tensor]]]:
+    """Run all DiscriminatorPs as a single stack of grouped Conv1d, numerically equivalent to running them one by one.
+
+    Rows (Frame series) of each period are laid end-to-end on a time axis, in slots aligned to the total stride so that row boundaries survive strided convs.
+    The zero gaps in the slots act as each row's zero padding, so they are re-zeroed after every conv.
+    Then the periods are stacked on the channel axis and processed with `groups=n_periods` convs.
+
+    Args:
+        discriminators    - DiscriminatorPs of the same structure
+        x                 :: (B, T) - Waveform
+        cond_embedding_id :: (1,)   - Shared conditioning embedding index
+        layouts           - Single-entry cache of the layout, keyed by the input length/device/dtype (replaced on a new key)
+    Returns:
+                          - (y_d, fmap) for each DiscriminatorP
+    """
+    periods, n_group = [d.period for d in discriminators], len(discriminators)
+    layers = list(zip(*[[*d.convs, d.conv_post] for d in discriminators]))
+    d0 = discriminators[0]
+
+    x = x.to(d0.conv_post.bias.dtype)
+    b, t = x.shape
+    key = (t, x.device, x.dtype)
+    if key not in layouts:
+        layouts.clear()
+        layouts[key] = _grouped_periods_layout(discriminators, t, x.device, x.dtype)
+    length0, slots, valids, masks = layouts[key]
+
+    # Layout :: (B, T) -> (B, T=period*frm) -> (B, Period, Frame) -> (B, Period, Slot) -> (B, Period*Slot) -> (B, L) -> (B, Group, L)
+    streams = []
+    for p, slot, frame in zip(periods, slots[0], valids[0]):
+        rows = F.pad(_pad_to_period(x, p).view(b, frame, p).transpose(1, 2), (0, slot - frame))
+        streams.append(F.pad(rows.reshape(b, p * slot), (0, length0 - p * slot)))
+    x = torch.stack(streams, dim=1)
+
+    # Conv :: (B, Group*Feat, L) -> (B, Group*Feat, L'<L)
+    feats: List[Tensor] = []
+    for i, convs in enumerate(layers):
+        weight, bias = torch.cat([_effective_weight(conv) for conv in convs]), torch.cat([conv.bias for conv in convs])
+        h = x
+        x = F.conv1d(x, weight, bias, stride=convs[0].stride, padding=convs[0].padding, groups=n_group)
+        if i == len(layers) - 1 and d0.emb is not None and cond_embedding_id is not None:
+            # Shared embedding as grouped 1x1 conv :: (B, Group*Feat, L) -> (B, Group, L)
+            emb = torch.cat([d.emb(cond_embedding_id).view(1, -1, 1) for d in discriminators])
+            x = x + F.conv1d(h, emb, groups=n_group)
+        # Gap re-zeroing
+        x.view(b, n_group, -1, x.size(-1)).mul_(masks[i])
+        if i < len(layers) - 1:
+            x = F.leaky_relu_(x, d0.lrelu_slope)
+        feats.append(x)
+
+    # Unlayout :: (B, Group*Feat, L) -> (B, Feat, Period*Slot) -> (B, Feat, Period, Slot) -> (B, Feat, Period, Frame) -> (B, Feat, Frame, Period)
+    outputs = []
+    for k, p in enumerate(periods):
+        fmap = []
+        for i, feat in enumerate(feats):
+            slot, valid = slots[i + 1][k], valids[i + 1][k]
+            f = feat.view(b, n_group, -1, feat.size(-1))[:, k, :, : p * slot]
+            fmap.append(f.view(b, f.size(1), p, slot)[..., :valid].transpose(2, 3))
+        # :: (B, 1, Frame, Period) -> (B, FramePeriod)
+        outputs.append((fmap[-1].reshape(b, -1), fmap[1:]))
+
+    return outputs
+
+
+def squeeze_conv2d_optimizer_state(optimizer_state: dict, params: list[Tensor]) -> None:
+    """Migrate an optimizer state of Conv2d-era DiscriminatorP (c.f. `DiscriminatorP._load_from_state_dict`) for the Conv1d params, in place.
+
+    Args:
+        optimizer_state - `Optimizer.state_dict()` of old checkpoint, e.g. AdamW's `exp_avg`/`exp_avg_sq` :: (Cout, Cin, K, 1)
+        params          - Current parameters in the optimizer's order, which give the target shapes
+    """
+    for idx, state in optimizer_state["state"].items():
+        param = params[idx]
+        for name, value in state.items():
+            # :: (Cout, Cin, K, 1) -> (Cout, Cin, K)
+            if torch.is_tensor(value) and value.dim() == 4 and value.squeeze(-1).shape == param.shape:
+                state[name] = value.squeeze(-1)
+
+
+def _script_for_inference(module: nn.Module, methods: list[str] | None = None) -> torch.jit.ScriptModule:
+    """Compile a weight_norm-free sub-discriminator into a frozen and fused (e.g. Conv-ReLU) TorchScript module.
+
+    Args:
+        module  - The sub-discriminator
+        methods - Methods other than `forward` to be kept in the compiled module
+    """
+    module.eval()
+    module.to(memory_format=torch.channels_last)
+    frozen = torch.jit.freeze(torch.jit.script(module), preserved_attrs=methods)
+    return torch.jit.optimize_for_inference(frozen, other_methods=methods)
 
 
 class MultiPeriodDiscriminator(nn.Module):
@@ -16,28 +241,135 @@ class MultiPeriodDiscriminator(nn.Module):
         periods (tuple[int]): Tuple of periods for each discriminator.
         num_embeddings (int, optional): Number of embeddings. None means non-conditional discriminator.
             Defaults to None.
+        use_cuda_graphs (bool, optional): Whether to capture the sub-discriminators' forward/backward as CUDA graphs,
+            one per input signature (shape/dtype/device/requires_grad, grad mode, autocast dtype and parameters' requires_grad).
+            Returned logits/fmaps are the graph's static buffers, so the next call with the same signature overwrites them
+            (consume or clone them before that). Defaults to False.
+        group_periods (bool, optional): Whether to run all the periods as a single grouped conv stack (fewer kernel launches, a bit more FLOPs).
+            Falls back to per-period run for per-sample conditioning or compiled sub-discriminators. Defaults to False.
     """
 
-    def __init__(self, periods: Tuple[int] = (2, 3, 5, 7, 11), num_embeddings: int = None):
+    def __init__(
+        self,
+        periods: Tuple[int] = (2, 3, 5, 7, 11),
+        num_embeddings: int = None,
+        use_cuda_graphs: bool = False,
+        group_periods: bool = False,
+    ):
         super().__init__()
+        self.use_cuda_graphs = use_cuda_graphs
+        self.group_periods = group_periods
         self.discriminators = nn.ModuleList([DiscriminatorP(period=p, num_embeddings=num_embeddings) for p in periods])
+        self._streams: list[torch.cuda.Stream] = []
+        self._graphed: dict[tuple, Callable] = {}
+        self._grouped_layouts: dict[tuple, tuple] = {}
 
     def forward(
-        self, y: torch.Tensor, y_hat: torch.Tensor, bandwidth_id: torch.Tensor = None
+        self, y: torch.Tensor, y_hat: torch.Tensor, bandwidth_id: torch.Tensor = None, detach_real: bool = False,
     ) -> Tuple[List[torch.Tensor], List[torch.Tensor], List[List[torch.Tensor]], List[List[torch.Tensor]]]:
-        y_d_rs = []
-        y_d_gs = []
-        fmap_rs = []
-        fmap_gs = []
+        """
+        Args:
+            y           :: (B, T)
+            y_hat       :: (B, T)
+            detach_real - Whether to run real samples without autograd (e.g. for G step, where real outputs are only targets)
+        """
+        if detach_real:
+            with torch.no_grad():
+                y_d_rs, fmap_rs = _unzip_outputs(self._forward(y, bandwidth_id))
+            y_d_gs, fmap_gs = _unzip_outputs(self._forward(y_hat, bandwidth_id))
+            return y_d_rs, y_d_gs, fmap_rs, fmap_gs
+
+        # Real/Fake batching :: (B, T) & (B, T) -> (2B, T)
+        x = torch.cat([y, y_hat], dim=0)
+        if bandwidth_id is not None and bandwidth_id.size(0) > 1:
+            bandwidth_id = bandwidth_id.repeat(2)
+
+        # Real/Fake split
+        return _split_real_fake(self._forward(x, bandwidth_id))
+
+    def _forward(self, x: Tensor, bandwidth_id: None | Tensor) -> list[tuple[Tensor, list[Tensor]]]:
+        """Run all sub-discriminators.
+
+        Args:
+            x :: (B, T)
+        Returns:
+              - (y_d, fmap) for each sub-discriminator
+        """
+        if self.use_cuda_graphs and x.is_cuda:
+            return self._run_graphed(x, bandwidth_id)
+        if self._groupable(bandwidth_id):
+            return _run_grouped_periods(self.discriminators, x, bandwidth_id, self._grouped_layouts)
+        fns = [partial(d, x=x, cond_embedding_id=bandwidth_id) for d in self.discriminators]
+        return _run_concurrently(fns, self._streams, x.device)
+
+    def _run_graphed(self, x: Tensor, bandwidth_id: None | Tensor) -> list[tuple[Tensor, list[Tensor]]]:
+        """Run all sub-discriminators as a CUDA graph, captured on the first call with a new input signature.
+
+        The graph bakes in the grad mode, the autocast dtype and the set of parameters to be differentiated (e.g. frozen by `toggle_optimizer`) at capture,
+        so they are part of the signature.
+        Under autocast, capture runs with its weight cast cache disabled (required by `make_graphed_callables`), then replays regardless of the cache.
+        """
+        args = (x,) if bandwidth_id is None else (x, bandwidth_id)
+        autocast_dtype = torch.get_autocast_gpu_dtype() if torch.is_autocast_enabled() else None
+        key = (
+            torch.is_grad_enabled(),
+            autocast_dtype,
+            tuple(p.requires_grad for p in self.discriminators.parameters()),
+            *((arg.shape, arg.dtype, arg.device, arg.requires_grad) for arg in args),
+        )
+        if key not in self._graphed:
+            sample_args = tuple(arg.detach().clone().requires_grad_(arg.requires_grad) for arg in args)
+            # Own layout cache, which keeps the masks read by graph replays alive
+            graphable = _GraphableMPD(self.discriminators, {} if self._groupable(bandwidth_id) else None)
+            with torch.autocast("cuda", dtype=autocast_dtype, enabled=autocast_dtype is not None, cache_enabled=False):
+                self._graphed[key] = torch.cuda.make_graphed_callables(graphable, sample_args)
+        return self._graphed[key](*args)
+
+    def _apply(self, fn, *args, **kwargs):
+        # Graphs hold the parameters at capture and layouts hold the device/dtype masks, so they are stale after `.to()`/`.cuda()`/`.half()` etc.
+        self._graphed.clear()
+        self._grouped_layouts.clear()
+        return super()._apply(fn, *args, **kwargs)
+
+    def _groupable(self, bandwidth_id: None | Tensor) -> bool:
+        """Whether the grouped run (`_run_grouped_periods`) is applicable."""
+        shared_cond = bandwidth_id is None or bandwidth_id.size(0) == 1
+        return self.group_periods and shared_cond and all(isinstance(d, DiscriminatorP) for d in self.discriminators)
+
+    def fuse_for_inference(self) -> None:
+        """Collapse the weight_norm of all sub-discriminators, in place (see `DiscriminatorP.fuse_for_inference`)."""
         for d in self.discriminators:
-            y_d_r, fmap_r = d(x=y, cond_embedding_id=bandwidth_id)
-            y_d_g, fmap_g = d(x=y_hat, cond_embedding_id=bandwidth_id)
-            y_d_rs.append(y_d_r)
-            fmap_rs.append(fmap_r)
-            y_d_gs.append(y_d_g)
-            fmap_gs.append(fmap_g)
+            d.fuse_for_inference()
+        self._graphed.clear()
+
+    def eval_optimized(self) -> "MultiPeriodDiscriminator":
+        """Switch to inference-only mode, replacing the sub-discriminators with compiled ones (see `DiscriminatorP.eval_optimized`)."""
+        self.discriminators = nn.ModuleList([d.eval_optimized() for d in self.discriminators])
+        self._graphed.clear()
+        return self
+
+
+class _GraphableMPD(nn.Module):
+    """Serial (or grouped) run of MPD sub-discriminators with Tensor-only arguments, as `torch.cuda.make_graphed_callables` requires.
+
+    It shares (not copies) the sub-discriminators, so graphed backward updates the original parameters.
+    """
 
-        return y_d_rs, y_d_gs, fmap_rs, fmap_gs
+    def __init__(self, discriminators: nn.ModuleList, grouped_layouts: None | dict = None):
+        """
+        Args:
+            discriminators  - Sub-discriminators
+            grouped_layouts - Layout cache of `_run_grouped_periods`, None means serial run
+        """
+        super().__init__()
+        self.discriminators = discriminators
+        self.grouped_layouts = grouped_layouts
+
+    def forward(self, x: Tensor, *cond_embedding_id: Tensor) -> list[tuple[Tensor, list[Tensor]]]:
+        cond = cond_embedding_id[0] if cond_embedding_id else None
+        if self.grouped_layouts is not None:
+            return _run_grouped_periods(self.discriminators, x, cond, self.grouped_layouts)
+        return [d(x=x, cond_embedding_id=cond) for d in self.discriminators]
 
 
 class DiscriminatorP(nn.Module):
@@ -51,61 +383,93 @@ class DiscriminatorP(nn.Module):
     ):
         super().__init__()
         self.period = period
+        # Convolutions are applied only along the frame axis, so periods are folded into the batch and processed by Conv1d
         self.convs = nn.ModuleList([
-            weight_norm(Conv2d(   1,   32, (kernel_size, 1), (stride, 1), padding=(kernel_size // 2, 0))),
-            weight_norm(Conv2d(  32,  128, (kernel_size, 1), (stride, 1), padding=(kernel_size // 2, 0))),
-            weight_norm(Conv2d( 128,  512, (kernel_size, 1), (stride, 1), padding=(kernel_size // 2, 0))),
-            weight_norm(Conv2d( 512, 1024, (kernel_size, 1), (stride, 1), padding=(kernel_size // 2, 0))),
-            weight_norm(Conv2d(1024, 1024, (kernel_size, 1), (1,      1), padding=(kernel_size // 2, 0))),
+            weight_norm(Conv1d(   1,   32, kernel_size, stride, padding=kernel_size // 2)),
+            weight_norm(Conv1d(  32,  128, kernel_size, stride, padding=kernel_size // 2)),
+            weight_norm(Conv1d( 128,  512, kernel_size, stride, padding=kernel_size // 2)),
+            weight_norm(Conv1d( 512, 1024, kernel_size, stride, padding=kernel_size // 2)),
+            weight_norm(Conv1d(1024, 1024, kernel_size, 1,      padding=kernel_size // 2)),
         ])
+        self.emb: Optional[nn.Embedding] = None
         if num_embeddings is not None:
             self.emb = torch.nn.Embedding(num_embeddings=num_embeddings, embedding_dim=1024)
             torch.nn.init.zeros_(self.emb.weight)
 
-        self.conv_post = weight_norm(Conv2d(1024, 1, (3, 1), 1, padding=(1, 0)))
+        self.conv_post = weight_norm(Conv1d(1024, 1, 3, 1, padding=1))
         self.lrelu_slope = lrelu_slope
 
-    def forward(self, x: Tensor, cond_embedding_id: None | Tensor = None) -> tuple[Tensor, list[Tensor]]:
+    def forward(self, x: Tensor, cond_embedding_id: Optional[Tensor] = None) -> Tuple[Tensor, List[Tensor]]:
         """
         Args:
             x :: (B, T)
         """
 
-        # Padding and Reshape :: (B, T) -> (B, 1, T) -> (B, 1, Frame, Period)
-        x = x.unsqueeze(1)
-        b, c, t = x.shape
-        ## Tail padding
-        if t % self.period != 0:
-            n_pad = self.period - (t % self.period)
-            x = F.pad(x, (0, n_pad), "reflect")
-            t = t + n_pad
-        ## Period
-        x = x.view(b, c, t // self.period, self.period)
+        # Cast to the discriminator's dtype (e.g. BF16 by `.to(torch.bfloat16)`)
+        bias = self.conv_post.bias
+        if bias is not None:
+            x = x.to(bias.dtype)
 
-        # Conv :: (B, 1, Frame=frm, Period=prd) -> (B, Feat, Frame<frm, Period=prd)
-        fmap = []
+        # Tail padding :: (B, T) -> (B, T=period*frm)
+        x = _pad_to_period(x, self.period)
+
+        # Reshape :: (B, T) -> (B, Frame, Period) -> (B, Period, Frame) -> (B*Period, 1, Frame)
+        b, t = x.shape
+        x = x.view(b, t // self.period, self.period).transpose(1, 2).reshape(b * self.period, 1, t // self.period)
+
+        # Conv :: (B*Period, 1, Frame=frm) -> (B*Period, Feat, Frame<frm)
+        fmap: List[Tensor] = [torch.empty(0)] * len(self.convs)
         for i, conv in enumerate(self.convs):
             x = conv(x)
-            x = F.leaky_relu(x, self.lrelu_slope)
+            x = F.leaky_relu_(x, self.lrelu_slope)
             if i > 0:
-                fmap.append(x)
+                fmap[i - 1] = x
 
-        if cond_embedding_id is not None:
+        h: Optional[Tensor] = None
+        if self.emb is not None and cond_embedding_id is not None:
             emb = self.emb(cond_embedding_id)
-            h = (emb.view(1, -1, 1, 1) * x).sum(dim=1, keepdims=True)
-        else:
-            h = 0
-
-        # :: (B, Feat, Frame<frm, Period=prd) ->  (B, 1, Frame<frm, Period=prd)
+            if emb.size(0) == 1:
+                # Shared embedding as 1x1 conv :: (B*Period, Feat, Frame) -> (B*Period, 1, Frame)
+                h = F.conv1d(x, emb.view(1, -1, 1))
+            else:
+                # Per-sample embedding :: (B, Feat) -> (B*Period, 1, Feat) @ (B*Period, Feat, Frame) -> (B*Period, 1, Frame)
+                h = torch.bmm(emb.repeat_interleave(self.period, dim=0).unsqueeze(1), x)
+
+        # :: (B*Period, Feat, Frame<frm) ->  (B*Period, 1, Frame<frm)
         x = self.conv_post(x)
-        fmap.append(x)
-        x += h
+        if h is not None:
+            x = x + h
+        fmap[-1] = x
+
+        # Layout restoration :: (B*Period, Feat, Frame) -> (B, Period, Feat, Frame) -> (B, Feat, Frame, Period)
+        for i, f in enumerate(fmap):
+            fmap[i] = f.view(b, self.period, f.size(1), f.size(2)).permute(0, 2, 3, 1)
 
         # :: (B, 1, Frame<frm, Period=prd) -> (B, FramePeriod=<frm*prd)
-        x = torch.flatten(x, 1, -1)
+        x = fmap[-1].reshape(b, -1)
 
         return x, fmap
 
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # Backward compatibility - Conv2d (kernel=(K, 1)) weights of old checkpoints :: (Cout, Cin, K, 1) -> (Cout, Cin, K)
+        for key, value in state_dict.items():
+            if key.startswith((prefix + "convs.", prefix + "conv_post.")) and value.dim() == 4:
+                state_dict[key] = value.squeeze(-1)
+        super()._load_from_state_dict(state_dict, prefix, *args, **kwargs)
+
+    def fuse_for_inference(self) -> None:
+        """Collapse the weight_norm reparameterization into plain conv weights, in place. Call this only when training is over."""
+        for conv in [*self.convs, self.conv_post]:
+            remove_weight_norm(conv)
+
+    def eval_optimized(self) -> torch.jit.ScriptModule:
+        """Compile into an inference-only TorchScript module, frozen and optimized (Conv-LReLU fusion).
+
+        weight_norm is fused in place because its hook is not scriptable, so call this only when training is over.
+        """
+        self.fuse_for_inference()
+        return _script_for_inference(self)
+
 
 class MultiResolutionDiscriminator(nn.Module):
     def __init__(
@@ -124,27 +488,57 @@ class MultiResolutionDiscriminator(nn.Module):
         super().__init__()
 
         self.discriminators = nn.ModuleList([DiscriminatorR(resolution=r, num_embeddings=num_embeddings) for r in resolutions])
+        self._streams: list[torch.cuda.Stream] = []
+
+    def forward(
+        self, y: Tensor, y_hat: Tensor, bandwidth_id: None | Tensor = None, detach_real: bool = False,
+    ) -> tuple[list[Tensor], list[Tensor], list[list[Tensor]], list[list[Tensor]]]:
+        """wave -> (real/fake batching) -> (STFT) -> spec -> (sub-disc) -> (real/fake split) -> o_disc.
 
-    def forward(self, y: Tensor, y_hat: Tensor, bandwidth_id: None | Tensor = None) -> tuple[list[Tensor], list[Tensor], list[list[Tensor]], list[list[Tensor]]]:
+        Real and fake waveforms share a single STFT per resolution.
+
+        Args:
+            y           :: (B, T)
+            y_hat       :: (B, T)
+            detach_real - Whether to run real samples separately without autograd (e.g. for G step, where real outputs are only targets)
         """
+        if detach_real:
+            with torch.no_grad():
+                y_d_rs, fmap_rs = _unzip_outputs(self._forward(y, bandwidth_id))
+            y_d_gs, fmap_gs = _unzip_outputs(self._forward(y_hat, bandwidth_id))
+            return y_d_rs, y_d_gs, fmap_rs, fmap_gs
+
+        # Real/Fake batching :: (B, T) & (B, T) -> (2B, T)
+        x = torch.cat([y, y_hat], dim=0)
+        if bandwidth_id is not None and bandwidth_id.size(0) > 1:
+            bandwidth_id = bandwidth_id.repeat(2)
+
+        # Real/Fake split
+        return _split_real_fake(self._forward(x, bandwidth_id))
+
+    def _forward(self, x: Tensor, bandwidth_id: None | Tensor) -> list[tuple[Tensor, list[Tensor]]]:
+        """Run all sub-discriminators.
+
         Args:
-            y     :: (B, T)
-            y_hat :: (B, T)
+            x :: (B, T)
+        Returns:
+              - (y_d, fmap) for each sub-discriminator
         """
-        y_d_rs = []
-        y_d_gs = []
-        fmap_rs = []
-        fmap_gs = []
+        # wave2spec :: (B, T) -> (B, Freq, Frame) - One STFT per resolution, launched back-to-back
+        specs = _run_concurrently([partial(d.spectrogram, x) for d in self.discriminators], self._streams, x.device)
+
+        fns = [partial(d.forward_from_spec, spec, bandwidth_id) for d, spec in zip(self.discriminators, specs)]
+        return _run_concurrently(fns, self._streams, x.device)
 
+    def fuse_for_inference(self) -> None:
+        """Collapse the weight_norm of all sub-discriminators, in place (see `DiscriminatorR.fuse_for_inference`)."""
         for d in self.discriminators:
-            y_d_r, fmap_r = d(x=y,     cond_embedding_id=bandwidth_id)
-            y_d_g, fmap_g = d(x=y_hat, cond_embedding_id=bandwidth_id)
-            y_d_rs.append(y_d_r)
-            fmap_rs.append(fmap_r)
-            y_d_gs.append(y_d_g)
-            fmap_gs.append(fmap_g)
+            d.fuse_for_inference()
 
-        return y_d_rs, y_d_gs, fmap_rs, fmap_gs
+    def eval_optimized(self) -> "MultiResolutionDiscriminator":
+        """Switch to inference-only mode, replacing the sub-discriminators with compiled ones (see `DiscriminatorR.eval_optimized`)."""
+        self.discriminators = nn.ModuleList([d.eval_optimized() for d in self.discriminators])
+        return self
 
 
 class DiscriminatorR(nn.Module):
@@ -170,12 +564,15 @@ class DiscriminatorR(nn.Module):
             weight_norm(nn.Conv2d(channels,    channels, kernel_size=3,      stride=(2, 1), padding=1)),
             weight_norm(nn.Conv2d(channels,    channels, kernel_size=3,      stride=(2, 2), padding=1)),
         ])
+        self.emb: Optional[nn.Embedding] = None
         if num_embeddings is not None:
             self.emb = torch.nn.Embedding(num_embeddings=num_embeddings, embedding_dim=channels)
             torch.nn.init.zeros_(self.emb.weight)
         self.conv_post = weight_norm(nn.Conv2d(channels, 1, (3, 3), padding=(1, 1)))
+        # NHWC weights, matching the channels_last input of `forward_from_spec`
+        self.to(memory_format=torch.channels_last)
 
-    def forward(self, x: Tensor, cond_embedding_id: Tensor = None) -> tuple[Tensor, list[Tensor]]:
+    def forward(self, x: Tensor, cond_embedding_id: Optional[Tensor] = None) -> Tuple[Tensor, List[Tensor]]:
         """wave -> (STFT) -> spec -> (Nx[conv2d-LReLU]) -> feat -> (conv2d) -> (cond) -> o_disc.
         
         Args:
@@ -183,34 +580,65 @@ class DiscriminatorR(nn.Module):
         Returns:
               :: (B, FreqFrame)
         """
-        fmap = []
+        # wave2spec :: (B, T) -> (B, Freq, Frame)
+        spec = self.spectrogram(x)
+
+        return self.forward_from_spec(spec, cond_embedding_id)
+
+    def forward_from_spec(self, spec: Tensor, cond_embedding_id: Optional[Tensor] = None) -> Tuple[Tensor, List[Tensor]]:
+        """spec -> (Nx[conv2d-LReLU]) -> feat -> (conv2d) -> (cond) -> o_disc.
+
+        Args:
+            spec :: (B, Freq, Frame) - Magnitude spectrogram from `spectrogram`
+        Returns:
+                 :: (B, FreqFrame)
+        """
+        fmap: List[Tensor] = [torch.empty(0)] * (len(self.convs) + 1)
 
-        # wave2spec :: (B, T) -> (B, Freq, Frame) -> (B, 1, Freq, Frame)
-        x = self.spectrogram(x).unsqueeze(1)
+        # :: (B, Freq, Frame) -> (B, 1, Freq, Frame)
+        x = spec.unsqueeze(1)
+        x = x.contiguous(memory_format=torch.channels_last)
 
         # conv :: (B, 1, Freq=freq, Frame=frm) -> (B, Feat, Freq<freq, Frame<frm)
-        for conv2d in self.convs:
+        for i, conv2d in enumerate(self.convs):
             x = conv2d(x)
-            x = F.leaky_relu(x, self.lrelu_slope)
-            fmap.append(x)
+            x = F.leaky_relu_(x, self.lrelu_slope)
+            fmap[i] = x
 
-        if cond_embedding_id is not None:
+        h: Optional[Tensor] = None
+        if self.emb is not None and cond_embedding_id is not None:
             emb = self.emb(cond_embedding_id)
-            h = (emb.view(1, -1, 1, 1) * x).sum(dim=1, keepdims=True)
-        else:
-            h = 0
+            if emb.size(0) == 1:
+                # Shared embedding as 1x1 conv :: (B, Feat, Freq, Frame) -> (B, 1, Freq, Frame)
+                h = F.conv2d(x, emb.view(1, -1, 1, 1))
+            else:
+                # Per-sample embedding :: (B, 1, Feat) @ (B, Feat, Freq*Frame) -> (B, 1, Freq*Frame) -> (B, 1, Freq, Frame)
+                h = torch.bmm(emb.unsqueeze(1), x.flatten(2)).view(x.size(0), 1, x.size(2), x.size(3))
 
         # :: (B, Feat, Freq<freq, Frame<frm) -> (B, 1, Freq<freq, Frame<frm)
         x = self.conv_post(x)
-        fmap.append(x)
-
-        x += h
+        if h is not None:
+            x = x + h
+        fmap[-1] = x
 
         # :: (B, 1, Freq<freq, Frame<frm) -> (B, FreqFrame=<freq*<frm)
-        x = torch.flatten(x, 1, -1)
+        x = x.reshape(x.size(0), -1)
 
         return x, fmap
 
+    def fuse_for_inference(self) -> None:
+        """Collapse the weight_norm reparameterization into plain conv weights, in place. Call this only when training is over."""
+        for conv in [*self.convs, self.conv_post]:
+            remove_weight_norm(conv)
+
+    def eval_optimized(self) -> torch.jit.ScriptModule:
+        """Compile into an inference-only TorchScript module, frozen and optimized (Conv-LReLU fusion, channels-last).
+
+        weight_norm is fused in place because its hook is not scriptable, so call this only when training is over.
+        """
+        self.fuse_for_inference()
+        return _script_for_inference(self, methods=["spectrogram", "forward_from_spec"])
+
     def spectrogram(self, x: Tensor) -> Tensor:
         """
         Args:
@@ -220,7 +648,22 @@ class DiscriminatorR(nn.Module):
         """
         n_fft, hop_length, win_length = self.resolution
 
-        # NOTE: interestingly rectangular window kind of works here
-        mag_spec = torch.stft(x, n_fft=n_fft, hop_length=hop_length, win_length=win_length, window=None, center=True, return_complex=True).abs()
+        # Equivalent of `torch.stft(center=True, window=rect_window(win_length)).abs()` with real-input FFT.
+        # NOTE: interestingly rectangular window kind of works here. It is applied by framing.
+        # The window offset in n_fft (zero-padded by rfft) is a circular shift, which does not change magnitude.
+        # FFT of half-precision input in FP32 (no half-precision FFT support), then cast to the discriminator's dtype (e.g. BF16 by `.to(torch.bfloat16)`)
+        if x.dtype in (torch.float16, torch.bfloat16):
+            x = x.float()
+
+        # Center padding :: (B, T) -> (B, T+2*(n_fft//2)=L)
+        x = F.pad(x.unsqueeze(1), (n_fft // 2, n_fft // 2), "reflect").squeeze(1)
+        # Framing :: (B, L) -> (B, Frame, Win)
+        offset = (n_fft - win_length) // 2
+        x = x[:, offset : x.size(1) - n_fft + offset + win_length].unfold(-1, win_length, hop_length)
+        # Magnitude :: (B, Frame, Win) -> (B, Frame, Freq) -> (B, Freq, Frame)
+        mag_spec = torch.fft.rfft(x, n=n_fft).abs().transpose(1, 2)
+        bias = self.conv_post.bias
+        if bias is not None:
+            mag_spec = mag_spec.to(bias.dtype)
 
         return mag_spec
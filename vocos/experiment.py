@@ -6,7 +6,7 @@ import torch
 import torchaudio
 import transformers
 
-from vocos.discriminators import MultiPeriodDiscriminator, MultiResolutionDiscriminator
+from vocos.discriminators import MultiPeriodDiscriminator, MultiResolutionDiscriminator, squeeze_conv2d_optimizer_state
 from vocos.feature_extractors import FeatureExtractor
 from vocos.heads import FourierHead
 from vocos.helpers import plot_spectrogram_to_numpy
@@ -90,6 +90,15 @@ class VocosExp(pl.LightningModule):
             [{"scheduler": scheduler_disc, "interval": "step"}, {"scheduler": scheduler_gen, "interval": "step"}],
         )
 
+    def on_load_checkpoint(self, checkpoint: dict) -> None:
+        """Migrate D optimizer states of old checkpoints, whose DiscriminatorP convs were Conv2d (c.f. `DiscriminatorP._load_from_state_dict`)."""
+        optimizer_states = checkpoint.get("optimizer_states")
+        if not optimizer_states:
+            return
+        # State indices follow `configure_optimizers`'s D parameter order
+        disc_params = [*self.multiperioddisc.parameters(), *self.multiresddisc.parameters()]
+        squeeze_conv2d_optimizer_state(optimizer_states[0], disc_params)
+
     def forward(self, audio_input, **kwargs):
         """Analysis/Synthesis, wave-to-unit-to-feat-to-wave."""
         return self.head(self.backbone(self.feature_extractor(audio_input, **kwargs), **kwargs))
@@ -128,8 +137,8 @@ class VocosExp(pl.LightningModule):
         if optimizer_idx == 1:
             # G_Forward
             audio_hat = self(audio_input, **kwargs)
-            _, gen_score_mp,  fmap_rs_mp,  fmap_gs_mp  = self.multiperioddisc(y=audio_input, y_hat=audio_hat, **kwargs)
-            _, gen_score_mrd, fmap_rs_mrd, fmap_gs_mrd =   self.multiresddisc(y=audio_input, y_hat=audio_hat, **kwargs)
+            _, gen_score_mp,  fmap_rs_mp,  fmap_gs_mp  = self.multiperioddisc(y=audio_input, y_hat=audio_hat, detach_real=True, **kwargs)
+            _, gen_score_mrd, fmap_rs_mrd, fmap_gs_mrd =   self.multiresddisc(y=audio_input, y_hat=audio_hat, detach_real=True, **kwargs)
             # G_Loss
             ## Adversarial losses, normalized by the number of sub-discriminators
             loss_gen_mp,  list_loss_gen_mp  = self.gen_loss(disc_outputs=gen_score_mp)